@@ -1,13 +1,20 @@
 import logging
 
+import numpy as np
+
+from collections import deque
+from operator import itemgetter
+
 from capture import GameState
 from captureAgents import CaptureAgent
 
 from shared import (aStarSearch,
+                    FAST_SEARCH_AVAILABLE,
+                    TurnCtx,
+                    food_positions_soa,
                     in_our_field,
                     a_star_to_food_position,
                     avoid_enemy_collision,
-                    get_closest_point_in_our_field,
                     get_food_positions_enemy,
                     get_our_position,
                     get_my_initial_position,
@@ -15,6 +22,10 @@ from shared import (aStarSearch,
                     get_food_positions_ours,
                     get_initial_enemy_position)
 
+import shared_fast
+
+logger = logging.getLogger(__name__)
+
 
 # Attacker's heuristic configuration
 DISTANCE_FROM_ENEMY_TO_FLEE = 6
@@ -24,6 +35,11 @@ CAPSULE_EFFECT_DURATION = 35  # Less than the actual duration, to avoid pacman b
 TURNS_FLEEING_TOO_MUCH = 4
 TURNS_HAS_TO_FLEE = 6
 
+# Maps the (dx, dy) offset towards an adjacent cell to the action reaching it,
+# and the other way around
+_DIR = {(0, 1): 'North', (0, -1): 'South', (1, 0): 'East', (-1, 0): 'West'}
+_OFFSET = {action: offset for offset, action in _DIR.items()}
+
 
 class AttackAgent(CaptureAgent):
     """
@@ -53,7 +69,6 @@ class AttackAgent(CaptureAgent):
                 
         All heuristic and misc. values that affect the behavior are configurable in the global variables above
     """
-    logging.getLogger().setLevel(logging.INFO)
 
     # Food tracking counters
     food_in_last_turn = 0
@@ -63,13 +78,10 @@ class AttackAgent(CaptureAgent):
     capsules_in_last_turn = 0
     turns_with_capsule_effect = 0
 
-    # Sequence of actions to be executed at the start of the game (go towards an
-    # initial position, with no changes in-between turns)
-    first_actions = []
     already_randomized = False
 
     turn_counter = 0
-    has_fled = []
+    times_fled = 0
 
     fleeing_point = None
     turns_has_to_flee = 0
@@ -82,59 +94,165 @@ class AttackAgent(CaptureAgent):
         self.capsules_in_last_turn = len(self.get_capsules(game_state))
         self.turns_with_capsule_effect = 0
 
-    def heuristic(self, pos, game_state: GameState):
+        # Sequence of actions to be executed at the start of the game (go
+        # towards an initial position, with no changes in-between turns).
+        # Per-instance, so two agents never share it; a deque, since it is
+        # consumed from the front every turn
+        self.first_actions = deque()
+
+        # Turns in which we fled: has_been_fleeing_too_much only looks at the
+        # last three, so a bounded ring buffer (plus a running count) is enough
+        self.has_fled = deque(maxlen=3)
+        self.times_fled = 0
+
+        # Cache the layout dimensions and the walls as a numpy array, so the
+        # hot paths don't chase the game_state.data.layout attribute chain
+        self._W = game_state.data.layout.width
+        self._H = game_state.data.layout.height
+        self._walls_np = shared_fast.get_walls_grid(game_state.data.layout)
+
+        # Distance field from the enemy's start position, to pick "their
+        # closest food" without a maze-distance call per candidate
+        self._dist_from_enemy_start = shared_fast.distance_grid(game_state.data.layout,
+                                                                get_initial_enemy_position(self, game_state))
+
+        # The dividing column never moves, so precompute a per-x lookup of
+        # "is this column on our side" for the hot heuristic checks
+        width = self._W
+        mid = width // 2
+        self._is_home = bytes(1 if (x < mid) == self.red else 0 for x in range(width))
+
+        # The walls never move either: precompute the border cells on our side
+        # and every column's free cells instead of rescanning the layout per turn
+        border_x = mid - 1 if self.red else mid
+        self._border_cells = tuple(get_column_slice(border_x, game_state))
+        self._col_slices = {x: tuple(get_column_slice(x, game_state)) for x in range(width)}
+        self._closest_border_cache = {}
+
+        # Cached route towards the current fleeing point, so we don't re-run
+        # A* every turn while the destination stays the same
+        self._fleeing_actions = deque()
+        self._fleeing_expected_pos = None
+
+        # Danger field for the heuristic and penalty grid for the compiled A*
+        # backend, rebuilt every turn from the visible enemy positions
+        # (see choose_action)
+        self._danger = [bytearray(width) for _ in range(self._H)]
+        self._penalty_grid = None
+
+    def get_penalty_grid(self, game_state: GameState):
+        return self._penalty_grid
+
+    def _build_danger(self, game_state, enemy_cells):
         """
-        Attacker's A* heuristic that forces the path cost be higher for positions
-        within the FLEE distance of an enemy.
-
-        Note: we could also do this via stepCost, but this way we keep A* generic
+        Multi-source BFS from the visible enemies in their field, marking every
+        cell within DISTANCE_FROM_ENEMY_TO_FLEE steps (honoring walls) as
+        dangerous, so the heuristic becomes a single array read instead of a
+        maze-distance check per opponent per expanded node
         """
-
-        for agent_index in self.get_opponents(game_state):
+        walls = game_state.data.layout.walls
+        danger = [bytearray(self._W) for _ in range(self._H)]
+
+        queue = deque()
+        for (x, y) in enemy_cells:
+            danger[y][x] = 1
+            queue.append((x, y, 0))
+
+        while queue:
+            (x, y, depth) = queue.popleft()
+            if depth >= DISTANCE_FROM_ENEMY_TO_FLEE - 1:
+                continue
+            for (nx, ny) in ((x, y + 1), (x, y - 1), (x + 1, y), (x - 1, y)):
+                if not walls[nx][ny] and not danger[ny][nx]:
+                    danger[ny][nx] = 1
+                    queue.append((nx, ny, depth + 1))
+
+        return danger
+
+    def build_turn_ctx(self, game_state: GameState):
+        """
+        Snapshots every game-state query needed this turn, so the decision
+        methods below don't repeat them
+        """
+        our_pos = get_our_position(self, game_state)
+        opponents = self.get_opponents(game_state)
+        # Scan the opponents once; every decision method (and the danger
+        # field) reads from this list instead of re-querying the game state
+        enemy_positions = []
+        for agent_index in opponents:
             enemy_position = game_state.get_agent_position(agent_index)
-
             if enemy_position is not None:
-                if not in_our_field(self, enemy_position, game_state):
-                    distance_to_enemy = self.get_maze_distance(pos, enemy_position)
-                    if distance_to_enemy < DISTANCE_FROM_ENEMY_TO_FLEE:
-                        return COST_HEURISTIC_ENEMY_CLOSE
+                enemy_positions.append((agent_index, enemy_position,
+                                        bool(self._is_home[enemy_position[0]])))
+
+        foods = get_food_positions_enemy(self, game_state)
+        food_xs, food_ys = food_positions_soa(foods)
+        return TurnCtx(our_pos=our_pos,
+                       in_home=in_our_field(self, our_pos, game_state),
+                       foods=foods,
+                       capsules_len=len(self.get_capsules(game_state)),
+                       opponents=opponents,
+                       enemy_positions=enemy_positions,
+                       food_xs=food_xs,
+                       food_ys=food_ys)
+
+    def heuristic(self, pos, game_state: GameState, _cost_enemy_close=COST_HEURISTIC_ENEMY_CLOSE):
+        """
+        Attacker's A* heuristic that forces the path cost be higher for positions
+        within the FLEE distance of an enemy, via a danger field rebuilt once
+        per turn in choose_action. The cost constant is bound as a default
+        argument so each call does a LOAD_FAST instead of a global lookup.
 
-        return 1
+        Note: we could also do this via stepCost, but this way we keep A* generic
+        """
+        return _cost_enemy_close if self._danger[pos[1]][pos[0]] else 1
 
-    def update_counters(self, game_state):
+    def update_counters(self, game_state, ctx):
         self.turn_counter += 1
         if self.turns_has_to_flee > 0:
             self.turns_has_to_flee -= 1
 
         if self.turns_with_capsule_effect > 0:
             self.turns_with_capsule_effect -= 1
-            logging.info(f"Attacker: Capsule effect active, remaining turns: {self.turns_with_capsule_effect}")
+            logger.debug("Attacker: Capsule effect active, remaining turns: %d", self.turns_with_capsule_effect)
 
-        if self.capsules_in_last_turn > len(self.get_capsules(game_state)):
+        if self.capsules_in_last_turn > ctx.capsules_len:
             self.turns_with_capsule_effect = CAPSULE_EFFECT_DURATION
-            self.capsules_in_last_turn = len(self.get_capsules(game_state))
-            logging.info(f"Attacker: Ate a capsule! remaining turns: {self.turns_with_capsule_effect}")
+            self.capsules_in_last_turn = ctx.capsules_len
+            logger.info("Attacker: Ate a capsule! remaining turns: %d", self.turns_with_capsule_effect)
 
-        if in_our_field(self, get_our_position(self, game_state), game_state):
+        if ctx.in_home:
             self.food_eaten = 0
         else:
-            self.first_actions = []
+            self.first_actions.clear()
 
-        if self.already_randomized and get_our_position(self, game_state) == get_my_initial_position(self, game_state):
-            logging.info(
-                f"Attacker: I have been killed while going to my initial position or fleeing! Resetting actions...")
-            self.first_actions = []
+        if self.already_randomized and ctx.our_pos == get_my_initial_position(self, game_state):
+            logger.info("Attacker: I have been killed while going to my initial position or fleeing! Resetting actions...")
+            self.first_actions.clear()
             self.turns_has_to_flee = 0
 
-        food_in_current_turn = len(get_food_positions_enemy(self, game_state))
+        food_in_current_turn = len(ctx.foods)
         if food_in_current_turn < self.food_in_last_turn:
             self.food_in_last_turn = food_in_current_turn
             self.food_eaten += 1
-            logging.info(f"Attacker: Ate a food in last turn! Food eaten: {self.food_eaten}")
+            logger.info("Attacker: Ate a food in last turn! Food eaten: %d", self.food_eaten)
 
-    def has_been_fleeing_too_much(self, game_state):
-        if in_our_field(self, get_our_position(self, game_state), game_state):
-            if len(self.has_fled) > 4:
+    def get_closest_border_point(self, our_pos):
+        """
+        Closest border cell of our field from our_pos, memoized since both the
+        border cells and the maze distances are static
+        """
+        closest = self._closest_border_cache.get(our_pos)
+        if closest is None:
+            closest = min(self._border_cells,
+                          key=lambda cell: self.get_maze_distance(our_pos, cell),
+                          default=None)
+            self._closest_border_cache[our_pos] = closest
+        return closest
+
+    def has_been_fleeing_too_much(self, ctx):
+        if ctx.in_home:
+            if self.times_fled > 4:
                 if self.has_fled[-1] != self.last_fled_turn_checked:
                     self.last_fled_turn_checked = self.has_fled[-1]
                     return (self.has_fled[-1] - self.has_fled[-2] <= TURNS_FLEEING_TOO_MUCH) and (
@@ -142,53 +260,46 @@ class AttackAgent(CaptureAgent):
 
         return False
 
-    def decide_action_return(self, game_state):
+    def decide_action_return(self, game_state, ctx):
         """
         Return to the closest point in our field, deciding whether to flee or
         opportunistically grab extra food along the way
         """
-        closest_point_in_our_field = get_closest_point_in_our_field(self, game_state)
-        next_pos, next_actions = aStarSearch(self, get_our_position(self, game_state),
+        closest_point_in_our_field = self.get_closest_border_point(ctx.our_pos)
+        next_pos, next_actions = aStarSearch(self, ctx.our_pos,
                                              closest_point_in_our_field,
                                              game_state)
 
         has_to_flee = False
-        for agent_index in self.get_opponents(game_state):
-            enemy_position = game_state.get_agent_position(agent_index)
-            if enemy_position is not None:
-                if self.get_maze_distance(get_our_position(self, game_state),
-                                          enemy_position) < DISTANCE_FROM_ENEMY_TO_FLEE:
-                    has_to_flee = True
-                    break
+        for _, enemy_position, _ in ctx.enemy_positions:
+            if self.get_maze_distance(ctx.our_pos, enemy_position) < DISTANCE_FROM_ENEMY_TO_FLEE:
+                has_to_flee = True
+                break
 
         # If there are no enemies close and there is reachable food within one position, go for it even
-        # if it is not in our path
+        # if it is not in our path. The numpy mask prefilters the candidates at
+        # Manhattan distance 1 before paying any maze-distance lookup
         if not has_to_flee:
-            for food_pos in get_food_positions_enemy(self, game_state):
-                (x, y) = get_our_position(self, game_state)
+            (x, y) = ctx.our_pos
+            adjacent = (np.abs(ctx.food_xs - x) + np.abs(ctx.food_ys - y)) == 1
+            for food_pos in zip(ctx.food_xs[adjacent].tolist(), ctx.food_ys[adjacent].tolist()):
                 if self.get_maze_distance((x, y), food_pos) == 1:
-                    logging.info(
-                        f"Attacker: Ate {self.food_eaten} foods, returning to our field ({closest_point_in_our_field}). Doing a detour due to a nearby food ({food_pos}) with no enemies close")
-
-                    if food_pos == (x, y + 1):
-                        next_action = 'North'
-                    elif food_pos == (x, y - 1):
-                        next_action = 'South'
-                    elif food_pos == (x + 1, y):
-                        next_action = 'East'
-                    elif food_pos == (x - 1, y):
-                        next_action = 'West'
-
-                    return next_action
+                    next_action = _DIR.get((food_pos[0] - x, food_pos[1] - y))
+                    if next_action is not None:
+                        logger.debug(
+                            "Attacker: Ate %d foods, returning to our field (%s). Doing a detour due to a nearby food (%s) with no enemies close",
+                            self.food_eaten, closest_point_in_our_field, food_pos)
+                        return next_action
 
         # else: there are enemies close or no nearby food was found, do not risk it
-        logging.info(
-            f"Attacker: Ate {self.food_eaten} foods, returning to our field ({closest_point_in_our_field}). Enemies close: {has_to_flee}")
+        logger.debug(
+            "Attacker: Ate %d foods, returning to our field (%s). Enemies close: %s",
+            self.food_eaten, closest_point_in_our_field, has_to_flee)
         if len(next_actions) == 0:  # Only happens in the testCapture map
             return "Stop"
-        return avoid_enemy_collision(self, get_our_position(self, game_state), next_actions[0], game_state)
+        return avoid_enemy_collision(self, ctx.our_pos, next_actions[0], game_state)
 
-    def decide_action_attack(self, game_state):
+    def decide_action_attack(self, game_state, ctx):
         """
         Go towards the closest enemy food. If it's the game start, instead of going towards the closest
         one go towards a random food within the top 3 closest ones (this may confuse the enemy defender
@@ -196,51 +307,68 @@ class AttackAgent(CaptureAgent):
         """
         if len(self.first_actions) == 0 and not self.already_randomized:
             self.already_randomized = True
-            _, self.first_actions = a_star_to_food_position(self, game_state,
-                                                            get_food_positions_enemy,
-                                                            randomize=True)
-            logging.info("Attacker: Start of match, going to a random enemy food...")
+            _, first_actions = a_star_to_food_position(self, game_state,
+                                                       get_food_positions_enemy,
+                                                       randomize=True,
+                                                       food_positions=ctx.foods)
+            self.first_actions = deque(first_actions)
+            logger.info("Attacker: Start of match, going to a random enemy food...")
 
         if len(self.first_actions) > 0:
             # It's the start of the game, and we still have a set of actions to follow towards
             # the initial food
-            return avoid_enemy_collision(self, get_our_position(self, game_state),
-                                         self.first_actions.pop(0),
+            return avoid_enemy_collision(self, ctx.our_pos,
+                                         self.first_actions.popleft(),
                                          game_state)
         elif self.turns_has_to_flee > 0:
-            # Continue going towards the fleeing point
-            logging.info(f"Attacker: I have to keep fleeing towards a defender's patrol point for {self.turns_has_to_flee} turns, enemies close")
-            if self.fleeing_point == get_our_position(self, game_state): # Go to a new one
-                self.fleeing_point = self.get_fleeing_point(game_state)
-
-            _, fleeing_actions = aStarSearch(self,
-                                                      get_our_position(self, game_state),
-                                                      self.fleeing_point,
-                                                      game_state)
-            return fleeing_actions[0]
-
-        if self.has_been_fleeing_too_much(game_state):
+            # Continue going towards the fleeing point, re-planning only if we
+            # need a new one or got pushed off the cached route
+            logger.debug("Attacker: I have to keep fleeing towards a defender's patrol point for %d turns, enemies close", self.turns_has_to_flee)
+            if self.fleeing_point == ctx.our_pos: # Go to a new one
+                self.fleeing_point = self.get_fleeing_point(game_state, ctx)
+                self.plan_fleeing_route(game_state, ctx)
+            elif len(self._fleeing_actions) == 0 or ctx.our_pos != self._fleeing_expected_pos:
+                self.plan_fleeing_route(game_state, ctx)
+
+            return self.pop_fleeing_action(ctx)
+
+        if self.has_been_fleeing_too_much(ctx):
             if len(get_food_positions_ours(self, game_state)) == 0:  # They have eaten all our foods
                 return "Stop"
 
-            self.fleeing_point = self.get_fleeing_point(game_state)
+            self.fleeing_point = self.get_fleeing_point(game_state, ctx)
 
             self.turns_has_to_flee = TURNS_HAS_TO_FLEE
 
-            logging.info(f"Attacker: I have been fleeing too much, going to random close enemy food ({self.fleeing_point})")
+            logger.info("Attacker: I have been fleeing too much, going to random close enemy food (%s)", self.fleeing_point)
 
-            _, fleeing_actions = aStarSearch(self,
-                                                  get_our_position(self, game_state),
-                                                  self.fleeing_point,
-                                                  game_state)
-            return fleeing_actions[0]
+            self.plan_fleeing_route(game_state, ctx)
+            return self.pop_fleeing_action(ctx)
         else:
-            dest, next_actions = a_star_to_food_position(self, game_state, get_food_positions_enemy, randomize=False)
-            logging.info(f"Attacker: Going to closest enemy food ({dest})")
+            dest, next_actions = a_star_to_food_position(self, game_state, get_food_positions_enemy, randomize=False,
+                                                         food_positions=ctx.foods)
+            logger.debug("Attacker: Going to closest enemy food (%s)", dest)
 
-        return avoid_enemy_collision(self, get_our_position(self, game_state), next_actions[0], game_state)
+        return avoid_enemy_collision(self, ctx.our_pos, next_actions[0], game_state)
 
-    def get_fleeing_point(self, game_state):
+    def plan_fleeing_route(self, game_state, ctx):
+        """
+        (Re)runs A* towards the current fleeing point, caching the whole action
+        sequence so the following fleeing turns just consume it
+        """
+        _, fleeing_actions = aStarSearch(self, ctx.our_pos, self.fleeing_point, game_state)
+        self._fleeing_actions = deque(fleeing_actions)
+        self._fleeing_expected_pos = ctx.our_pos
+
+    def pop_fleeing_action(self, ctx):
+        action = self._fleeing_actions.popleft()
+        (dx, dy) = _OFFSET[action]
+        # Where this action should leave us; if we are somewhere else next turn
+        # (killed or blocked), the cached route gets invalidated
+        self._fleeing_expected_pos = (ctx.our_pos[0] + dx, ctx.our_pos[1] + dy)
+        return action
+
+    def get_fleeing_point(self, game_state, ctx):
         # Returns the highest or lowest position located in the column where
         # the closest food in our field from the enemy's start position perspective
         # is located in (whichever is the furthest)
@@ -248,64 +376,75 @@ class AttackAgent(CaptureAgent):
         closest_food_from_enemy, _ = a_star_to_food_position(self,
                                                              game_state,
                                                              get_food_positions_ours,
-                                                             initial_position_function=get_initial_enemy_position)
+                                                             initial_position_function=get_initial_enemy_position,
+                                                             distances_grid=self._dist_from_enemy_start)
         (x, _) = closest_food_from_enemy
-        valid_positions_in_column = get_column_slice(x, game_state)
-        valid_positions_in_column = sorted(valid_positions_in_column, key=lambda x: x[1])
-        patrol_point_1 = valid_positions_in_column[0]
-        patrol_point_2 = valid_positions_in_column[-1]
-        distance_to_pp_1 = self.get_maze_distance(get_our_position(self, game_state), patrol_point_1)
-        distance_to_pp_2 = self.get_maze_distance(get_our_position(self, game_state), patrol_point_2)
+        valid_positions_in_column = self._col_slices[x]
+        patrol_point_1 = min(valid_positions_in_column, key=itemgetter(1))
+        patrol_point_2 = max(valid_positions_in_column, key=itemgetter(1))
+        distance_to_pp_1 = self.get_maze_distance(ctx.our_pos, patrol_point_1)
+        distance_to_pp_2 = self.get_maze_distance(ctx.our_pos, patrol_point_2)
         if distance_to_pp_1 > distance_to_pp_2:
             fleeing_point = patrol_point_1
         else:
             fleeing_point = patrol_point_2
         return fleeing_point
 
-    def decide_action_in_enemy_field(self, game_state):
+    def decide_action_in_enemy_field(self, game_state, ctx):
         # We don't have the capsule effect
         if self.turns_with_capsule_effect == 0:
             # Check if there are enemies close (visible)
-            for agent_index in self.get_opponents(game_state):
-                enemy_position = game_state.get_agent_position(agent_index)
-
-                if enemy_position is not None:
-                    if not in_our_field(self, enemy_position, game_state):
-                        distance_to_enemy = self.get_maze_distance(get_our_position(self, game_state),
-                                                                   enemy_position)
-                        if distance_to_enemy < DISTANCE_FROM_ENEMY_TO_FLEE:
-                            # Attempt to flee towards our field
-                            flee_point = get_closest_point_in_our_field(self, game_state)
+            for _, enemy_position, enemy_in_home in ctx.enemy_positions:
+                if not enemy_in_home:
+                    distance_to_enemy = self.get_maze_distance(ctx.our_pos, enemy_position)
+                    if distance_to_enemy < DISTANCE_FROM_ENEMY_TO_FLEE:
+                        # Attempt to flee towards our field
+                        flee_point = self.get_closest_border_point(ctx.our_pos)
 
-                            logging.info(
-                                f"Attacker: Fleeing due to enemy within {distance_to_enemy} actions, going to {flee_point}")
+                        logger.debug(
+                            "Attacker: Fleeing due to enemy within %d actions, going to %s",
+                            distance_to_enemy, flee_point)
 
-                            self.has_fled.append(self.turn_counter)
+                        self.has_fled.append(self.turn_counter)
+                        self.times_fled += 1
 
-                            next_pos, next_actions = aStarSearch(self,
-                                                                 get_our_position(self, game_state),
-                                                                 flee_point,
-                                                                 game_state)
+                        next_pos, next_actions = aStarSearch(self,
+                                                             ctx.our_pos,
+                                                             flee_point,
+                                                             game_state)
 
-                            return avoid_enemy_collision(self,
-                                                         get_our_position(self, game_state),
-                                                         next_actions[0],
-                                                         game_state)
+                        return avoid_enemy_collision(self,
+                                                     ctx.our_pos,
+                                                     next_actions[0],
+                                                     game_state)
 
         # Else: we are in the enemy field, but we still have the capsule effect or no enemies
         # close, so we don't care about them for now
-        return self.decide_action_attack(game_state)
+        return self.decide_action_attack(game_state, ctx)
 
     def choose_action(self, game_state: GameState):
-        # Update the counters on every turn
-        self.update_counters(game_state)
+        # Snapshot the game-state queries once, then update the counters
+        ctx = self.build_turn_ctx(game_state)
+
+        # Rebuild the danger field around the visible enemies in their field,
+        # so every A* expansion this turn pays a single lookup
+        enemy_cells = [pos for _, pos, in_home in ctx.enemy_positions if not in_home]
+        if FAST_SEARCH_AVAILABLE:
+            self._penalty_grid = shared_fast.danger_penalty_grid(game_state.data.layout,
+                                                                 enemy_cells,
+                                                                 DISTANCE_FROM_ENEMY_TO_FLEE - 1,
+                                                                 COST_HEURISTIC_ENEMY_CLOSE)
+        else:
+            self._danger = self._build_danger(game_state, enemy_cells)
+
+        self.update_counters(game_state, ctx)
 
         # Decide which course of action to follow
-        if self.food_eaten > FOOD_EATEN_TO_RETURN or len(get_food_positions_enemy(self, game_state)) == 0:
-            return self.decide_action_return(game_state)
+        if self.food_eaten > FOOD_EATEN_TO_RETURN or len(ctx.foods) == 0:
+            return self.decide_action_return(game_state, ctx)
 
-        elif in_our_field(self, get_our_position(self, game_state), game_state):
-            return self.decide_action_attack(game_state)
+        elif ctx.in_home:
+            return self.decide_action_attack(game_state, ctx)
 
         else:
-            return self.decide_action_in_enemy_field(game_state)
+            return self.decide_action_in_enemy_field(game_state, ctx)
@@ -1,10 +1,17 @@
 import logging
 import random
 
+import numpy as np
+
+from collections import deque
+from operator import itemgetter
+
 from capture import GameState
 from captureAgents import CaptureAgent
 
 from shared import (aStarSearch,
+                    FAST_SEARCH_AVAILABLE,
+                    TurnCtx,
                     in_our_field,
                     a_star_to_food_position,
                     get_our_position,
@@ -12,11 +19,18 @@ from shared import (aStarSearch,
                     get_food_positions_ours,
                     get_column_slice)
 
+import shared_fast
+
+logger = logging.getLogger(__name__)
+
 COST_HEURISTIC_CROSSING_ENEMY_FIELD = 5
 CAPSULE_EFFECT_DURATION = 40
 DISTANCE_FROM_ENEMY_TO_FLEE = 5  # If with capsule
 COST_HEURISTIC_ENEMY_CLOSE = 5
 
+# Maps an action to the (dx, dy) offset it moves us by
+_OFFSET = {'North': (0, 1), 'South': (0, -1), 'East': (1, 0), 'West': (-1, 0)}
+
 
 class DefendAgent(CaptureAgent):
     """
@@ -47,11 +61,7 @@ class DefendAgent(CaptureAgent):
                 
         All heuristic and misc. values that affect the behavior are configurable in the global variables above
     """
-    logging.getLogger().setLevel(logging.INFO)
 
-    # Sequence of actions to be executed at the start of the game (go towards an
-    # initial position, with no changes in-between turns)
-    initial_actions = []
     initial_goal = None
 
     last_patrolled_point = None
@@ -59,19 +69,19 @@ class DefendAgent(CaptureAgent):
     patrol_point_2 = None
 
     # Food tracking counters
-    food_positions_in_last_turn = None
     eaten_food_position = None
 
     # Capsule tracking counters
     capsules_in_last_turn = 0
     turns_with_capsule_effect = 0
 
-    def heuristic(self, pos, game_state: GameState):
+    def heuristic(self, pos, game_state: GameState, _cost_crossing=COST_HEURISTIC_CROSSING_ENEMY_FIELD):
         """
-        Defender's A* heuristic
+        Defender's A* heuristic. The cost constant is bound as a default
+        argument so each call does a LOAD_FAST instead of a global lookup
         """
-        if not in_our_field(self, pos, game_state):
-            return COST_HEURISTIC_CROSSING_ENEMY_FIELD
+        if not self._is_home[pos[0]]:
+            return _cost_crossing
 
         # for agent_index in self.get_opponents(game_state):
         #    enemy_position = game_state.get_agent_position(agent_index)
@@ -86,15 +96,84 @@ class DefendAgent(CaptureAgent):
 
     def register_initial_state(self, game_state: GameState):
         CaptureAgent.register_initial_state(self, game_state)
-        self.food_positions_in_last_turn = set(get_food_positions_ours(self, game_state))
+
+        # Sequence of actions to be executed at the start of the game (go
+        # towards an initial position, with no changes in-between turns).
+        # Per-instance, and a deque since it is consumed from the front
+        self.initial_actions = deque()
+
+        # Keep the raw food grid (as a bool array) and the capsule positions of
+        # the previous turn, so update_counters can diff them cheaply
+        self._last_food = np.asarray(self.get_food_you_are_defending(game_state).data, dtype=bool)
+        self._last_capsules = set(self.get_capsules_you_are_defending(game_state))
+
         self.capsules_in_last_turn = len(self.get_capsules_you_are_defending(game_state))
         self.turns_with_capsule_effect = 0
 
-    def do_vertical_patrol(self, game_state):
+        # Cache the layout dimensions and the walls as a numpy array, so the
+        # hot paths don't chase the game_state.data.layout attribute chain
+        self._W = game_state.data.layout.width
+        self._H = game_state.data.layout.height
+        self._walls_np = shared_fast.get_walls_grid(game_state.data.layout)
+
+        # Distance field from the enemy's start position, to pick "their
+        # closest food" without a maze-distance call per candidate
+        self._dist_from_enemy_start = shared_fast.distance_grid(game_state.data.layout,
+                                                                get_initial_enemy_position(self, game_state))
+
+        # The dividing column never moves, so precompute a per-x lookup of
+        # "is this column on our side" for the hot heuristic checks
+        width = self._W
+        mid = width // 2
+        self._is_home = bytes(1 if (x < mid) == self.red else 0 for x in range(width))
+
+        # The walls never move either: precompute every column's free cells
+        # instead of rescanning the layout each time we need them
+        self._col_slices = {x: tuple(get_column_slice(x, game_state)) for x in range(width)}
+
+        # Precomputed patrol routes between the two (static) patrol points,
+        # filled in calculate_patrol_points
+        self._patrol_routes = {}
+
+        # Penalty grid for the compiled A* backend. Our heuristic only depends
+        # on the (fixed) field split, so it can be built once
+        self._penalty_grid = None
+        if FAST_SEARCH_AVAILABLE:
+            self._penalty_grid = shared_fast.half_field_penalty_grid(game_state.data.layout,
+                                                                     self.red,
+                                                                     COST_HEURISTIC_CROSSING_ENEMY_FIELD)
+
+    def get_penalty_grid(self, game_state: GameState):
+        return self._penalty_grid
+
+    def build_turn_ctx(self, game_state: GameState):
+        """
+        Snapshots every game-state query needed this turn, so the decision
+        methods below don't repeat them
+        """
+        our_pos = get_our_position(self, game_state)
+        opponents = self.get_opponents(game_state)
+        # Scan the opponents once; the decision methods read from this list
+        # instead of re-querying the game state
+        enemy_positions = []
+        for agent_index in opponents:
+            enemy_position = game_state.get_agent_position(agent_index)
+            if enemy_position is not None:
+                enemy_positions.append((agent_index, enemy_position,
+                                        bool(self._is_home[enemy_position[0]])))
+
+        return TurnCtx(our_pos=our_pos,
+                       in_home=in_our_field(self, our_pos, game_state),
+                       foods=get_food_positions_ours(self, game_state),
+                       capsules_len=len(self.get_capsules_you_are_defending(game_state)),
+                       opponents=opponents,
+                       enemy_positions=enemy_positions)
+
+    def do_vertical_patrol(self, game_state, ctx):
         if self.patrol_point_1 is None and self.patrol_point_2 is None:  # Only happens on the testCapture map
             return "Stop"
-        distance_to_pp_1 = self.get_maze_distance(get_our_position(self, game_state), self.patrol_point_1)
-        distance_to_pp_2 = self.get_maze_distance(get_our_position(self, game_state), self.patrol_point_2)
+        distance_to_pp_1 = self.get_maze_distance(ctx.our_pos, self.patrol_point_1)
+        distance_to_pp_2 = self.get_maze_distance(ctx.our_pos, self.patrol_point_2)
 
         # It has visited none of them yet, choose the closest one
         if self.last_patrolled_point is None:
@@ -118,17 +197,23 @@ class DefendAgent(CaptureAgent):
         elif self.last_patrolled_point == self.patrol_point_2:
             goal = self.patrol_point_1
 
-        logging.info(f"Defender: Patrolling to ({goal})")
-        _, actions = aStarSearch(self, get_our_position(self, game_state), goal, game_state)
+        logger.debug("Defender: Patrolling to (%s)", goal)
+        actions = self._patrol_routes[goal].get(ctx.our_pos)
+        if actions is None:
+            # We are off the precomputed patrol route (coming back from a
+            # pursuit or respawned), plan it normally this turn
+            _, actions = aStarSearch(self, ctx.our_pos, goal, game_state)
         return actions[0]
 
-    def calculate_patrol_points(self, game_state):
-        if len(get_food_positions_ours(self, game_state)) > 0:  # Else: It's the testCapture map
+    def calculate_patrol_points(self, game_state, ctx):
+        if len(ctx.foods) > 0:  # Else: It's the testCapture map
             self.initial_goal, _ = a_star_to_food_position(self, game_state, get_food_positions_ours,
-                                                           initial_position_function=get_initial_enemy_position)
-            logging.info(f"Defender: Start of match, going towards food at ({self.initial_goal}")
-            _, actions = aStarSearch(self, get_our_position(self, game_state), self.initial_goal, game_state)
-            self.initial_actions = actions
+                                                           initial_position_function=get_initial_enemy_position,
+                                                           distances_grid=self._dist_from_enemy_start,
+                                                           food_positions=ctx.foods)
+            logger.info("Defender: Start of match, going towards food at (%s)", self.initial_goal)
+            _, actions = aStarSearch(self, ctx.our_pos, self.initial_goal, game_state)
+            self.initial_actions = deque(actions)
 
             # For debugging: start in a patrol point instead
             # _, actions = aStarSearch(self, get_our_position(self, game_state), (25, 2), game_state)
@@ -137,85 +222,107 @@ class DefendAgent(CaptureAgent):
             # Calculate the patrol points between the lowest and highest points of the column where
             # the closest food (from the enemy's initial position) is in
             (patrolling_column, _) = self.initial_goal
-            valid_positions_in_column = get_column_slice(patrolling_column, game_state)
-            valid_positions_in_column = sorted(valid_positions_in_column, key=lambda x: x[1])
-            self.patrol_point_1 = valid_positions_in_column[0]
-            self.patrol_point_2 = valid_positions_in_column[-1]
-
-    def update_counters(self, game_state):
+            valid_positions_in_column = self._col_slices[patrolling_column]
+            self.patrol_point_1 = min(valid_positions_in_column, key=itemgetter(1))
+            self.patrol_point_2 = max(valid_positions_in_column, key=itemgetter(1))
+
+            # The patrol points never move, so precompute the routes between
+            # them once, including how to resume each route from any of its
+            # intermediate cells. do_vertical_patrol then becomes a lookup
+            for start, goal in ((self.patrol_point_1, self.patrol_point_2),
+                                (self.patrol_point_2, self.patrol_point_1)):
+                _, actions = aStarSearch(self, start, goal, game_state)
+                route_from_cell = {}
+                pos = start
+                for i, action in enumerate(actions):
+                    route_from_cell[pos] = actions[i:]
+                    (dx, dy) = _OFFSET[action]
+                    pos = (pos[0] + dx, pos[1] + dy)
+                self._patrol_routes[goal] = route_from_cell
+
+    def update_counters(self, game_state, ctx):
         if self.initial_goal is None:
-            self.calculate_patrol_points(game_state)
-
-        # Check if our food has been eaten
-        food_positions_in_this_turn = set(get_food_positions_ours(self, game_state))
-        foods_eaten = self.food_positions_in_last_turn - food_positions_in_this_turn
-        self.food_positions_in_last_turn = food_positions_in_this_turn
-
-        if len(foods_eaten) > 0:
-            self.eaten_food_position = list(foods_eaten)[0]
+            self.calculate_patrol_points(game_state, ctx)
+
+        # Check if our food has been eaten, diffing the raw food grids instead
+        # of building a position set per turn
+        current_food = np.asarray(self.get_food_you_are_defending(game_state).data, dtype=bool)
+        eaten_mask = self._last_food & ~current_food
+        if eaten_mask.any():
+            xs, ys = np.nonzero(eaten_mask)
+            self.eaten_food_position = (int(xs[0]), int(ys[0]))
+        self._last_food = current_food
+
+        # Eaten capsules count as eaten food too (they are not in the grid)
+        current_capsules = set(self.get_capsules_you_are_defending(game_state))
+        capsules_eaten = self._last_capsules - current_capsules
+        if capsules_eaten:
+            self.eaten_food_position = next(iter(capsules_eaten))
+        self._last_capsules = current_capsules
 
         # Track capsule effect
-        if self.capsules_in_last_turn > len(self.get_capsules_you_are_defending(game_state)):
+        if self.capsules_in_last_turn > ctx.capsules_len:
             self.turns_with_capsule_effect = CAPSULE_EFFECT_DURATION
-            self.capsules_in_last_turn = len(self.get_capsules_you_are_defending(game_state))
-            logging.info(f"Defender: An attacker ate a capsule! remaining turns: {self.turns_with_capsule_effect}")
+            self.capsules_in_last_turn = ctx.capsules_len
+            logger.info("Defender: An attacker ate a capsule! remaining turns: %d", self.turns_with_capsule_effect)
 
         elif self.turns_with_capsule_effect > 0:
             self.turns_with_capsule_effect -= 1
-            logging.info(f"Defender: Capsule effect active, remaining turns: {self.turns_with_capsule_effect}")
+            logger.debug("Defender: Capsule effect active, remaining turns: %d", self.turns_with_capsule_effect)
 
-    def decide_action_enemy_close_in_our_field(self, enemy_position, game_state):
+    def decide_action_enemy_close_in_our_field(self, enemy_position, game_state, ctx):
         if self.turns_with_capsule_effect == 0:
             # Pursue it
-            logging.info(f"Defender: Found an enemy at {enemy_position}, pursuing it")
-            _, actions = aStarSearch(self, get_our_position(self, game_state), enemy_position,
+            logger.debug("Defender: Found an enemy at %s, pursuing it", enemy_position)
+            _, actions = aStarSearch(self, ctx.our_pos, enemy_position,
                                      game_state)
             return actions[0]
         else:
             # The enemy has a capsule effect, but by the time we reach them they will have
             # run out of it, so we can pursue them
-            if self.turns_with_capsule_effect < self.get_maze_distance(get_our_position(self, game_state),
-                                                                       enemy_position):
-                logging.info(
-                    f"Defender: Found an enemy at {enemy_position} with capsule effect remaining for {self.turns_with_capsule_effect} turns but with distance {self.get_maze_distance(get_our_position(self, game_state), enemy_position)}, pursuing!")
-                _, actions = aStarSearch(self, get_our_position(self, game_state),
+            distance_to_enemy = self.get_maze_distance(ctx.our_pos, enemy_position)
+            if self.turns_with_capsule_effect < distance_to_enemy:
+                logger.debug(
+                    "Defender: Found an enemy at %s with capsule effect remaining for %d turns but with distance %d, pursuing!",
+                    enemy_position, self.turns_with_capsule_effect, distance_to_enemy)
+                _, actions = aStarSearch(self, ctx.our_pos,
                                          enemy_position, game_state)
                 return actions[0]
             else:
                 # Found enemies that can reach us while still having the capsule effect: It's dangerous
                 # to pursue it, so go back to the patrol and hope to catch them when they return
-                logging.info(
-                    f"Defender: Found an enemy at {enemy_position} with capsule effect remaining for {self.turns_with_capsule_effect} turns but with distance {self.get_maze_distance(get_our_position(self, game_state), enemy_position)}, doing the patrol!")
-                return self.do_vertical_patrol(game_state)
+                logger.debug(
+                    "Defender: Found an enemy at %s with capsule effect remaining for %d turns but with distance %d, doing the patrol!",
+                    enemy_position, self.turns_with_capsule_effect, distance_to_enemy)
+                return self.do_vertical_patrol(game_state, ctx)
 
     def choose_action(self, game_state: GameState):
-        self.update_counters(game_state)
+        ctx = self.build_turn_ctx(game_state)
+        self.update_counters(game_state, ctx)
 
         if len(self.initial_actions) != 0:
             # It's the start of the game, and we still have a set of actions to follow towards
             # the initial food
-            return self.initial_actions.pop(0)
+            return self.initial_actions.popleft()
         else:
             # Check if there are visible enemies close
-            for agent_index in self.get_opponents(game_state):
-                enemy_position = game_state.get_agent_position(agent_index)
-
-                if enemy_position is not None:
-                    if in_our_field(self, enemy_position, game_state):
-                        return self.decide_action_enemy_close_in_our_field(enemy_position, game_state)
+            for _, enemy_position, enemy_in_home in ctx.enemy_positions:
+                if enemy_in_home:
+                    return self.decide_action_enemy_close_in_our_field(enemy_position, game_state, ctx)
 
             # No enemies close, check if the foods are disappearing (an enemy may be inside in an unknown location)
             if self.eaten_food_position is not None:  # They have eaten one of our foods!
-                if self.eaten_food_position != get_our_position(self, game_state):
+                if self.eaten_food_position != ctx.our_pos:
                     # Go towards it until we reach it, see an enemy or another food is eaten
-                    logging.info(
-                        f"Defender: They have eaten one of our foods, going towards it ({self.eaten_food_position})")
-                    _, actions = aStarSearch(self, get_our_position(self, game_state), self.eaten_food_position,
+                    logger.debug(
+                        "Defender: They have eaten one of our foods, going towards it (%s)",
+                        self.eaten_food_position)
+                    _, actions = aStarSearch(self, ctx.our_pos, self.eaten_food_position,
                                              game_state)
                     return actions[0]
                 else:
-                    logging.info(f"Defender: Reached food position!")
+                    logger.info("Defender: Reached food position!")
                     self.eaten_food_position = None
 
             # Nothing is happening: patrol
-            return self.do_vertical_patrol(game_state)
+            return self.do_vertical_patrol(game_state, ctx)
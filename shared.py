@@ -1,18 +1,63 @@
-from util import PriorityQueue
 from capture import GameState
 
 import copy
+import heapq
+import itertools
 import random
 import logging
 
+import numpy as np
+
+from collections import deque
+from dataclasses import dataclass
+from operator import itemgetter
+
 from contest.game import Actions
 from capture import AgentRules
 
+import shared_fast
+
+# numpy is a hard dependency of this module (and of shared_fast), so that
+# import always succeeds; only numba is optional. Without it we keep the
+# pure-Python A* instead of the compiled kernel
+FAST_SEARCH_AVAILABLE = shared_fast.NUMBA_AVAILABLE
+
+logger = logging.getLogger(__name__)
+
 
 ####################
 # Shared functions #
 ####################
 
+@dataclass
+class TurnCtx:
+    """
+    Per-turn snapshot of the game-state queries used by the decision methods,
+    built once at the start of choose_action so we don't walk the game state
+    again on every check within the same turn
+    """
+    our_pos: tuple
+    in_home: bool
+    foods: list  # Enemy foods for the attacker, our foods for the defender
+    capsules_len: int
+    opponents: list
+    enemy_positions: list  # (agent_index, position, in_home) per visible enemy
+    # SoA views of foods (numpy int arrays), for vectorized distance filters
+    food_xs: object = None
+    food_ys: object = None
+
+
+def food_positions_soa(food_positions):
+    """
+    Splits a list of (x, y) food positions into two numpy arrays (SoA layout),
+    so distance filters become contiguous C-level scans
+    """
+    count = len(food_positions)
+    food_xs = np.fromiter((x for (x, _) in food_positions), dtype=np.int64, count=count)
+    food_ys = np.fromiter((y for (_, y) in food_positions), dtype=np.int64, count=count)
+    return food_xs, food_ys
+
+
 def get_legal_actions_own(agent, game_state: GameState, pos):
     """
     Our own version of get_legal_actions that makes a copy of pacman's
@@ -28,90 +73,248 @@ def get_legal_actions_own(agent, game_state: GameState, pos):
     return AgentRules.filter_for_allowed_actions(possible_actions)
 
 
+# Goals within this Manhattan distance skip A* for a plain BFS, where the
+# priority-queue overhead dominates the actual search
+SHORT_PATH_MANHATTAN = 4
+
+
+def _short_path_bfs(initial_position, food_position, neighbors):
+    """
+    Fast path of aStarSearch for goals a few steps away (nearby food, adjacent
+    enemy pursuit): a flat-queue BFS with parent pointers. The heuristic
+    penalties don't get a say at this horizon
+    """
+    queue = deque((initial_position,))
+    parents = {initial_position: None}
+
+    while queue:
+        pos = queue.popleft()
+        if pos == food_position:
+            actions = []
+            while parents[pos] is not None:
+                (pos, action) = parents[pos]
+                actions.append(action)
+            actions.reverse()
+            return food_position, actions
+
+        for (action, successor) in neighbors[pos]:
+            if successor not in parents:
+                parents[successor] = (pos, action)
+                queue.append(successor)
+
+    return []
+
+
+# Routes already found this episode, reused when the same (start, goal) query
+# comes back with the same visible enemies: the heuristics only depend on the
+# walls and on those positions, so the cached route is still optimal. Keyed by
+# the layout object itself (identity hash), never by id(): a freed layout's id
+# can be reused by a later game's maze, which would replay routes through the
+# wrong walls. Keys churn as enemies move, so the cache is dropped once it
+# grows too large
+_path_cache = {}
+_PATH_CACHE_MAX = 4096
+
+
 def aStarSearch(agent, initial_position, food_position, game_state: GameState):
-    """A* implementation from last assignment's"""
-    # Queue of states and their corresponding action traces
-    frontier = PriorityQueue()
-    visited_states = set()  # List of visited nodes that we don't want to check again
+    """
+    Cache wrapper over the actual search: agents re-plan the same route over
+    several consecutive turns (patrols, repeated flee checks), and most of
+    those turns can reuse the previous answer in O(1)
+    """
+    enemy_key = tuple(game_state.get_agent_position(agent_index)
+                      for agent_index in agent.get_opponents(game_state))
+    key = (game_state.data.layout, agent.index, initial_position, food_position, enemy_key)
+
+    actions = _path_cache.get(key)
+    if actions is not None:
+        return food_position, list(actions)
 
-    frontier.push((initial_position, [], 0), 0)
+    result = _a_star_search(agent, initial_position, food_position, game_state)
+    if result:
+        if len(_path_cache) >= _PATH_CACHE_MAX:
+            _path_cache.clear()
+        _path_cache[key] = list(result[1])
+    return result
 
-    while not frontier.isEmpty():
+
+def _a_star_search(agent, initial_position, food_position, game_state: GameState):
+    """A* implementation from last assignment's"""
+    (sx, sy) = initial_position
+    (gx, gy) = food_position
+    if abs(sx - gx) + abs(sy - gy) <= SHORT_PATH_MANHATTAN:
+        return _short_path_bfs(initial_position, food_position,
+                               get_neighbors_table(game_state.data.layout))
+
+    # If numba is installed, run the compiled grid kernel instead. The agent
+    # provides a penalty grid mirroring its heuristic, so both paths return
+    # equivalent routes
+    if FAST_SEARCH_AVAILABLE and hasattr(agent, 'get_penalty_grid'):
+        penalty_grid = agent.get_penalty_grid(game_state)
+        if penalty_grid is not None:
+            walls = getattr(agent, '_walls_np', None)
+            if walls is None:
+                walls = shared_fast.get_walls_grid(game_state.data.layout)
+            (sx, sy) = initial_position
+            (gx, gy) = food_position
+            path = shared_fast.astar_grid(walls, int(sx), int(sy), int(gx), int(gy), penalty_grid)
+            if len(path) == 0 and initial_position != food_position:
+                return []
+            return food_position, [shared_fast.DIR_ACTIONS[d] for d in path]
+
+    # Open list of states. Instead of carrying the whole action trace in each
+    # entry (an O(depth) list copy per expansion), we keep parent pointers and
+    # rebuild the trace once when the goal is popped. Plain heapq with lazy
+    # deletion replaces util.PriorityQueue: stale entries are skipped via
+    # the closed buffer on pop instead of being searched for and replaced on push
+    frontier = []
+    counter = itertools.count()  # Tie-breaker, so positions never get compared
+    parents = {}  # pos -> (previous pos, action that got us there)
+
+    # Flat per-cell buffers indexed by the packed cell id y * width + x (the
+    # same encoding shared_fast uses): a bytearray closed set and a plain
+    # g-cost list skip hashing an (x, y) tuple on every pop and relaxation
+    width = game_state.data.layout.width
+    closed = bytearray(width * game_state.data.layout.height)
+    best_cost = [999999] * len(closed)
+    best_cost[initial_position[1] * width + initial_position[0]] = 0
+
+    # Guide the search with the contest's precomputed all-pairs maze
+    # distances. Every step costs at least 1 even before penalties, so the
+    # table is a consistent lower bound and A* pops far fewer nodes than the
+    # old uniform-cost ordering
+    maze_distance = agent.get_maze_distance
+
+    heapq.heappush(frontier, (maze_distance(initial_position, food_position), next(counter), initial_position))
+
+    # Expanding a node is a lookup in the precomputed per-layout table, not
+    # the deepcopy of the agent configuration get_legal_actions_own pays
+    neighbors = get_neighbors_table(game_state.data.layout)
+
+    while frontier:
         # Get the first element in the queue (the one with least cost)
-        pos, actions, cost_until_now = frontier.pop()
+        (_, _, pos) = heapq.heappop(frontier)
 
-        if pos not in visited_states:  # Otherwise, don't visit it
+        idx = pos[1] * width + pos[0]
+        if not closed[idx]:  # Otherwise, don't visit it
             if pos == food_position:
-                return pos, actions  # Return the action trace
-
-            visited_states.add(pos)  # Add the state to the visited states
-
-            legal_actions = get_legal_actions_own(agent, game_state, pos)
-            successor_states = []
-            (x, y) = pos
-            for action in legal_actions:
-                if action == 'North':
-                    successor_states.append(((x, y + 1), action, 1))
-                elif action == 'South':
-                    successor_states.append(((x, y - 1), action, 1))
-                elif action == 'East':
-                    successor_states.append(((x + 1, y), action, 1))
-                elif action == 'West':
-                    successor_states.append(((x - 1, y), action, 1))
-                # We disregard 'Stop'
-
-            for (successor, action, stepCost) in successor_states:
-                # We add to the queue:
-                # - The child
-                # - The trace of actions until this moment (and the action that generated the child)
-                # - The cost until now plus the cost of the current step
-                priority = cost_until_now + stepCost + agent.heuristic(successor, game_state)
-                # Update replaces, pushes or does nothing depending on the priority for us
-                frontier.update((successor, actions + [action], priority), priority)
+                # Walk the parent pointers back to rebuild the action trace
+                actions = []
+                while pos != initial_position:
+                    (pos, action) = parents[pos]
+                    actions.append(action)
+                actions.reverse()
+                return food_position, actions
+
+            closed[idx] = 1  # Add the state to the visited states
+            cost_until_now = best_cost[idx]
+
+            # We disregard 'Stop'
+            for (action, successor) in neighbors[pos]:
+                # The cost until now plus the cost of the current step
+                cost = cost_until_now + 1 + agent.heuristic(successor, game_state)
+                # Only relax the successor if this path improves on the best
+                # known one; outdated heap entries are discarded when popped
+                successor_idx = successor[1] * width + successor[0]
+                if cost < best_cost[successor_idx]:
+                    best_cost[successor_idx] = cost
+                    parents[successor] = (pos, action)
+                    heapq.heappush(frontier, (cost + maze_distance(successor, food_position),
+                                              next(counter), successor))
 
     # If the queue is empty, the goal node doesn't exist
     return []
 
 
+def _field_boundary(agent, game_state):
+    """
+    First column of the non-red half, cached on the agent so the hot
+    predicates below don't redo the division and attribute walk per call
+    """
+    boundary = getattr(agent, '_field_boundary_x', None)
+    if boundary is None:
+        boundary = agent._field_boundary_x = game_state.data.layout.width // 2
+    return boundary
+
+
 def in_our_field(agent, position, game_state):
     """
     Returns whether a position is in our field or not
     """
     (x, _) = position
     if agent.red:
-        return x < int(game_state.data.layout.width / 2)  # This is horrible
+        return x < _field_boundary(agent, game_state)
     else:
-        return x >= int(game_state.data.layout.width / 2)
+        return x >= _field_boundary(agent, game_state)
+
+
+# One bool[W, H] walls array per layout (same [x][y] indexing as the Grid),
+# so column scans become numpy slices instead of Python loops over the Grid.
+# Keyed by the layout object (identity hash), not id(), to stay safe once a
+# layout is freed and its id recycled
+_walls_np_cache = {}
+
+
+def get_walls_np(layout):
+    walls = _walls_np_cache.get(layout)
+    if walls is None:
+        walls = np.asarray(layout.walls.data, dtype=bool)
+        _walls_np_cache[layout] = walls
+    return walls
+
+
+# Action -> position delta, shared by every place that needs to apply (or
+# invert) a movement without an if/elif ladder
+_DELTA = {'North': (0, 1), 'South': (0, -1), 'East': (1, 0), 'West': (-1, 0)}
+
+# Walls never move during an episode, so the (action, successor) pairs of
+# every walkable cell are computed once per layout; search expansions and
+# legality checks then reduce to a dict lookup. Keyed by the layout object
+# (identity hash), not id(), so a reused id from a freed layout can never
+# serve a stale table
+_neighbors_cache = {}
+
+
+def get_neighbors_table(layout):
+    table = _neighbors_cache.get(layout)
+    if table is None:
+        walls = get_walls_np(layout)
+        (width, height) = walls.shape
+        table = {}
+        for x in range(1, width - 1):
+            for y in range(1, height - 1):
+                if walls[x, y]:
+                    continue
+                table[(x, y)] = tuple((action, (x + dx, y + dy))
+                                      for (action, (dx, dy)) in _DELTA.items()
+                                      if not walls[x + dx, y + dy])
+        _neighbors_cache[layout] = table
+    return table
 
 
 def get_closest_point_in_our_field(agent, game_state):
-    if agent.red:
-        x = int(game_state.data.layout.width / 2) - 1  # This is horrible (x2)
-    else:
-        x = int(game_state.data.layout.width / 2)
+    boundary = _field_boundary(agent, game_state)
+    x = boundary - 1 if agent.red else boundary
 
-    min_distance = 999999
-    min_point = None
-    for y in range(1, game_state.data.layout.height):
-        if not game_state.data.layout.walls[x][y]:
-            distance_to_point = agent.get_maze_distance(game_state.get_agent_position(agent.index), (x, y))
-            if distance_to_point < min_distance:
-                min_distance = distance_to_point
-                min_point = (x, y)
+    walls = get_walls_np(game_state.data.layout)
+    ys = np.flatnonzero(~walls[x, 1:]) + 1
 
-    return min_point
+    # Our position doesn't change while we compare border cells, so look it
+    # up once instead of per cell
+    our_pos = game_state.get_agent_position(agent.index)
+    maze_distance = agent.get_maze_distance
+    return min(((x, y) for y in ys.tolist()),
+               key=lambda point: maze_distance(our_pos, point),
+               default=None)
 
 
 def get_column_slice(col, game_state, offset=None):
     if offset is not None:
         col += offset
 
-    valid_positions = []
-    for y in range(1, game_state.data.layout.height):
-        if not game_state.data.layout.walls[col][y]:
-            valid_positions.append((col, y))
-
-    return valid_positions
+    walls = get_walls_np(game_state.data.layout)
+    ys = np.flatnonzero(~walls[col, 1:]) + 1
+    return [(col, y) for y in ys.tolist()]
 
 
 def avoid_enemy_collision(agent, current_pos, next_action, game_state):
@@ -120,35 +323,33 @@ def avoid_enemy_collision(agent, current_pos, next_action, game_state):
     it if possible
     """
     (x, y) = current_pos
-    if next_action == 'North':
-        a_star_pos = (x, y + 1)
-    elif next_action == 'South':
-        a_star_pos = (x, y - 1)
-    elif next_action == 'East':
-        a_star_pos = (x + 1, y)
-    elif next_action == 'West':
-        a_star_pos = (x - 1, y)
-
-    possible_actions_and_positions = []
-    actions = game_state.get_legal_actions(agent.index)
-    for action in actions:
-        if action == 'North':
-            possible_actions_and_positions.append((action, (x, y + 1)))
-        elif action == 'South':
-            possible_actions_and_positions.append((action, (x, y - 1)))
-        elif action == 'East':
-            possible_actions_and_positions.append((action, (x + 1, y)))
-        elif action == 'West':
-            possible_actions_and_positions.append((action, (x - 1, y)))
-
-
-    for agent_index in agent.get_opponents(game_state):
-        enemy_position = game_state.get_agent_position(agent_index)
-        if (enemy_position is not None and not in_our_field(agent, enemy_position, game_state)):
-            # Check if the action causes a collision with the enemy
-            for (action, position) in possible_actions_and_positions:
-                if agent.get_maze_distance(position, enemy_position) <= 1: # The agent can reach us in his next move if we move there too
-                    possible_actions_and_positions.remove((action, position))
+    (dx, dy) = _DELTA[next_action]
+    a_star_pos = (x + dx, y + dy)
+
+    threats = [position for position in
+               (game_state.get_agent_position(agent_index) for agent_index in agent.get_opponents(game_state))
+               if position is not None and not in_our_field(agent, position, game_state)]
+
+    # Common case: A*'s move doesn't step next to any visible enemy, so keep
+    # it without building and filtering the candidate moves at all
+    if all(agent.get_maze_distance(a_star_pos, enemy_position) > 1 for enemy_position in threats):
+        return next_action
+
+    # The legal moves are exactly the precomputed neighbors of our cell
+    # ('Stop' was already being filtered out here)
+    possible_actions_and_positions = list(get_neighbors_table(game_state.data.layout)[current_pos])
+
+    # Collect every colliding candidate first and filter once: removing from
+    # the list while iterating it skipped the element after each removal
+    colliding = set()
+    for enemy_position in threats:
+        # Check if the action causes a collision with the enemy
+        for (action, position) in possible_actions_and_positions:
+            if agent.get_maze_distance(position, enemy_position) <= 1: # The agent can reach us in his next move if we move there too
+                colliding.add((action, position))
+
+    possible_actions_and_positions = [candidate for candidate in possible_actions_and_positions
+                                      if candidate not in colliding]
 
     if len(possible_actions_and_positions) > 0:
         # Check if A*'s position is within the valid ones. If so, return its action
@@ -157,10 +358,8 @@ def avoid_enemy_collision(agent, current_pos, next_action, game_state):
                 return action
 
         action, position = random.choice(possible_actions_and_positions)
-        if agent.red:
-            logging.info(f"Red: Attacker: A* made me rush towards an enemy, doing an alternative action: {action}")
-        else:
-            logging.info(f"Blue: Attacker: A* made me rush towards an enemy, doing an alternative action: {action}")
+        logger.info("%s: Attacker: A* made me rush towards an enemy, doing an alternative action: %s",
+                    "Red" if agent.red else "Blue", action)
         return action
     
     # We could stop, but it's faster to just die next turn
@@ -168,17 +367,10 @@ def avoid_enemy_collision(agent, current_pos, next_action, game_state):
 
 
 def get_food_positions_enemy(agent, game_state: GameState):
-    isFood = agent.get_food(game_state)
-    food_state = [row for row in agent.get_food(game_state)]
-    food_positions = []
-
-    numRows = len(food_state[0])
-    numColumns = len(food_state)
-
-    for j in range(0, numRows - 1):
-        for i in range(0, numColumns - 1):
-            if isFood[i][j]:
-                food_positions.append((i, j))
+    # Single grid read and a C-level scan instead of the old nested Python
+    # loops (which also skipped the last row and column)
+    is_food = np.asarray(agent.get_food(game_state).data, dtype=bool)
+    food_positions = list(map(tuple, np.argwhere(is_food).tolist()))
 
     # Also add the capsules as an additional objective
     food_positions.extend(agent.get_capsules(game_state))
@@ -186,17 +378,8 @@ def get_food_positions_enemy(agent, game_state: GameState):
 
 
 def get_food_positions_ours(self, game_state: GameState):
-    isFood = self.get_food_you_are_defending(game_state)
-    food_state = [row for row in self.get_food_you_are_defending(game_state)]
-    food_positions = []
-
-    numRows = len(food_state[0])
-    numColumns = len(food_state)
-
-    for j in range(0, numRows - 1):
-        for i in range(0, numColumns - 1):
-            if isFood[i][j]:
-                food_positions.append((i, j))
+    is_food = np.asarray(self.get_food_you_are_defending(game_state).data, dtype=bool)
+    food_positions = list(map(tuple, np.argwhere(is_food).tolist()))
 
     # Also add the capsules as an additional objective
     food_positions.extend(self.get_capsules_you_are_defending(game_state))
@@ -204,27 +387,49 @@ def get_food_positions_ours(self, game_state: GameState):
 
 
 def a_star_to_food_position(agent, game_state: GameState, food_positions_function, randomize=False,
-                            initial_position_function=None):
+                            initial_position_function=None, distances_grid=None, food_positions=None):
     """
     Runs A* to the closest food position given by the function provided, returning
     the whole sequence of actions
 
     If randomize==True, go to one of the top 3 closest foods randomly
+
+    If a distances_grid (see shared_fast.distance_grid) is given, the closest
+    food is chosen via precomputed lookups rather than maze-distance calls
+
+    Callers that already hold this turn's food positions (TurnCtx.foods) can
+    pass them as food_positions to skip re-scanning the food grid
     """
     if initial_position_function is None:
         initial_position = game_state.get_agent_position(agent.index)
     else:
         initial_position = initial_position_function(agent, game_state)
 
-    distances_array = [
-        (agent.get_maze_distance(initial_position, food_position), food_position) for
-        food_position in food_positions_function(agent, game_state)]
-    distances_array = sorted(distances_array, key=lambda x: x[0])
+    if food_positions is None:
+        food_positions = food_positions_function(agent, game_state)
 
+    if distances_grid is not None:
+        distances_array = [(int(distances_grid[fy, fx]), (fx, fy)) for (fx, fy) in food_positions]
+    else:
+        # Prefilter to the top-5 Manhattan-closest foods with numpy before
+        # paying a maze-distance lookup per candidate
+        if len(food_positions) > 5:
+            food_xs, food_ys = food_positions_soa(food_positions)
+            (px, py) = initial_position
+            manhattan = np.abs(food_xs - px) + np.abs(food_ys - py)
+            top = np.argpartition(manhattan, 5)[:5]
+            food_positions = [food_positions[i] for i in top]
+
+        distances_array = [
+            (agent.get_maze_distance(initial_position, food_position), food_position) for
+            food_position in food_positions]
+
+    # We only ever need the closest food (or the closest 3), so a selection
+    # beats sorting the whole array
     if randomize:
-        (_, min_food_position) = random.choice(distances_array[:3])
+        (_, min_food_position) = random.choice(heapq.nsmallest(3, distances_array, key=itemgetter(0)))
     else:
-        (_, min_food_position) = distances_array[0]
+        (_, min_food_position) = min(distances_array, key=itemgetter(0))
 
     destination, next_actions = aStarSearch(agent, game_state.get_agent_position(agent.index),
                                             min_food_position,
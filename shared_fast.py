@@ -0,0 +1,310 @@
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:  # Numba is optional: shared.py falls back to the Python A*
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+
+#############################################
+# Compiled A* backend (optional, via numba) #
+#############################################
+
+# Direction encoding shared between the kernels and the Python wrappers:
+# 0 = North (+y), 1 = South (-y), 2 = East (+x), 3 = West (-x)
+DIR_ACTIONS = ('North', 'South', 'East', 'West')
+
+# One walls grid per layout, converted once so the kernels get a contiguous
+# uint8[H, W] array (walls[y, x]) instead of the Python Grid object. Both
+# caches below key on the layout object (identity hash) rather than id():
+# a freed layout's id can be recycled by a later game's maze, which would
+# silently hand out the wrong walls
+_walls_cache = {}
+
+
+def get_walls_grid(layout):
+    walls = _walls_cache.get(layout)
+    if walls is None:
+        walls = np.ascontiguousarray(np.array(layout.walls.data, dtype=np.uint8).T)
+        _walls_cache[layout] = walls
+    return walls
+
+
+# Full distance fields from fixed sources (e.g. the enemy's start position),
+# cached per (layout, start) since the maze is static
+_dist_cache = {}
+
+
+def distance_grid(layout, start):
+    """
+    Shortest-path distances (honoring walls) from start to every cell, as an
+    int32[H, W] array with -1 for unreachable cells
+    """
+    key = (layout, start)
+    dist = _dist_cache.get(key)
+    if dist is None:
+        walls = get_walls_grid(layout)
+        dist = _bfs_distances(walls, int(start[0]), int(start[1]))
+        _dist_cache[key] = dist
+    return dist
+
+
+@njit(cache=True)
+def _bfs_distances(walls, sx, sy):
+    height, width = walls.shape
+    dist = np.full((height, width), -1, dtype=np.int32)
+    queue = np.empty(height * width, dtype=np.int64)
+    head = 0
+    tail = 0
+    dist[sy, sx] = 0
+    queue[tail] = sy * width + sx
+    tail += 1
+
+    while head < tail:
+        node = queue[head]
+        head += 1
+        x = node % width
+        y = node // width
+        d = dist[y, x]
+        for direction in range(4):
+            if direction == 0:
+                nx, ny = x, y + 1
+            elif direction == 1:
+                nx, ny = x, y - 1
+            elif direction == 2:
+                nx, ny = x + 1, y
+            else:
+                nx, ny = x - 1, y
+            if nx < 0 or nx >= width or ny < 0 or ny >= height:
+                continue
+            if walls[ny, nx] or dist[ny, nx] >= 0:
+                continue
+            dist[ny, nx] = d + 1
+            queue[tail] = ny * width + nx
+            tail += 1
+
+    return dist
+
+
+def danger_penalty_grid(layout, enemy_positions, depth, cost_close):
+    """
+    Penalty grid for astar_grid: cells reachable from any of the given enemy
+    positions within depth steps (BFS, honoring walls) cost cost_close, the
+    rest cost 1. Mirrors the attacker's heuristic
+    """
+    walls = get_walls_grid(layout)
+    sources_x = np.array([x for (x, _) in enemy_positions], dtype=np.int64)
+    sources_y = np.array([y for (_, y) in enemy_positions], dtype=np.int64)
+    return _dilate_sources(walls, sources_x, sources_y, depth, cost_close)
+
+
+def half_field_penalty_grid(layout, red, cost_crossing):
+    """
+    Penalty grid for astar_grid: cells in the enemy half cost cost_crossing,
+    the rest cost 1. Mirrors the defender's heuristic
+    """
+    walls = get_walls_grid(layout)
+    height, width = walls.shape
+    penalty = np.ones((height, width), dtype=np.int64)
+    mid = width // 2
+    if red:
+        penalty[:, mid:] = cost_crossing
+    else:
+        penalty[:, :mid] = cost_crossing
+    return penalty
+
+
+@njit(cache=True)
+def _dilate_sources(walls, sources_x, sources_y, depth, cost_close):
+    height, width = walls.shape
+    penalty = np.ones((height, width), dtype=np.int64)
+    if sources_x.shape[0] == 0:
+        return penalty
+
+    # Multi-source BFS with a flat preallocated queue
+    dist = np.full((height, width), -1, dtype=np.int64)
+    queue = np.empty(height * width, dtype=np.int64)
+    head = 0
+    tail = 0
+    for i in range(sources_x.shape[0]):
+        x = sources_x[i]
+        y = sources_y[i]
+        if dist[y, x] < 0:
+            dist[y, x] = 0
+            penalty[y, x] = cost_close
+            queue[tail] = y * width + x
+            tail += 1
+
+    while head < tail:
+        node = queue[head]
+        head += 1
+        x = node % width
+        y = node // width
+        d = dist[y, x]
+        if d >= depth:
+            continue
+        for direction in range(4):
+            if direction == 0:
+                nx, ny = x, y + 1
+            elif direction == 1:
+                nx, ny = x, y - 1
+            elif direction == 2:
+                nx, ny = x + 1, y
+            else:
+                nx, ny = x - 1, y
+            if nx < 0 or nx >= width or ny < 0 or ny >= height:
+                continue
+            if walls[ny, nx] or dist[ny, nx] >= 0:
+                continue
+            dist[ny, nx] = d + 1
+            penalty[ny, nx] = cost_close
+            queue[tail] = ny * width + nx
+            tail += 1
+
+    return penalty
+
+
+@njit(cache=True)
+def _heap_push(heap_prio, heap_node, size, priority, node):
+    i = size
+    heap_prio[i] = priority
+    heap_node[i] = node
+    while i > 0:
+        parent = (i - 1) // 2
+        if heap_prio[parent] <= heap_prio[i]:
+            break
+        heap_prio[parent], heap_prio[i] = heap_prio[i], heap_prio[parent]
+        heap_node[parent], heap_node[i] = heap_node[i], heap_node[parent]
+        i = parent
+    return size + 1
+
+
+@njit(cache=True)
+def _heap_pop(heap_prio, heap_node, size):
+    top = heap_node[0]
+    size -= 1
+    heap_prio[0] = heap_prio[size]
+    heap_node[0] = heap_node[size]
+    i = 0
+    while True:
+        left = 2 * i + 1
+        right = left + 1
+        smallest = i
+        if left < size and heap_prio[left] < heap_prio[smallest]:
+            smallest = left
+        if right < size and heap_prio[right] < heap_prio[smallest]:
+            smallest = right
+        if smallest == i:
+            break
+        heap_prio[smallest], heap_prio[i] = heap_prio[i], heap_prio[smallest]
+        heap_node[smallest], heap_node[i] = heap_node[i], heap_node[smallest]
+        i = smallest
+    return top, size
+
+
+@njit(cache=True)
+def astar_grid(walls, sx, sy, gx, gy, penalty):
+    """
+    A* over the walls grid with the same cost model as the Python version
+    (each step costs 1 + penalty of the entered cell) plus an admissible
+    Manhattan distance towards the goal. Returns the path as an array of
+    direction codes (see DIR_ACTIONS), empty if the goal is unreachable
+    """
+    height, width = walls.shape
+    n = height * width
+
+    INF = np.int64(1) << 40
+    g = np.full(n, INF, dtype=np.int64)
+    parent_dir = np.full(n, -1, dtype=np.int8)
+    closed = np.zeros(n, dtype=np.uint8)
+
+    # Binary heap over preallocated arrays (heapq is not available here).
+    # Each cell can be pushed once per relaxation, bounded by the edge count
+    heap_prio = np.empty(5 * n, dtype=np.int64)
+    heap_node = np.empty(5 * n, dtype=np.int64)
+    size = 0
+
+    start = sy * width + sx
+    goal = gy * width + gx
+    g[start] = 0
+    size = _heap_push(heap_prio, heap_node, size, abs(sx - gx) + abs(sy - gy), start)
+
+    while size > 0:
+        node, size = _heap_pop(heap_prio, heap_node, size)
+        if closed[node]:
+            continue
+        closed[node] = 1
+        if node == goal:
+            break
+
+        x = node % width
+        y = node // width
+        g_node = g[node]
+        for direction in range(4):
+            if direction == 0:
+                nx, ny = x, y + 1
+            elif direction == 1:
+                nx, ny = x, y - 1
+            elif direction == 2:
+                nx, ny = x + 1, y
+            else:
+                nx, ny = x - 1, y
+            if nx < 0 or nx >= width or ny < 0 or ny >= height:
+                continue
+            if walls[ny, nx]:
+                continue
+            neighbor = ny * width + nx
+            if closed[neighbor]:
+                continue
+            tentative_g = g_node + 1 + penalty[ny, nx]
+            if tentative_g < g[neighbor]:
+                g[neighbor] = tentative_g
+                parent_dir[neighbor] = direction
+                priority = tentative_g + abs(nx - gx) + abs(ny - gy)
+                size = _heap_push(heap_prio, heap_node, size, priority, neighbor)
+
+    if g[goal] >= INF:
+        return np.empty(0, dtype=np.int8)
+
+    # Walk the parent directions back from the goal to count and fill the path
+    length = 0
+    node = goal
+    while node != start:
+        direction = parent_dir[node]
+        x = node % width
+        y = node // width
+        if direction == 0:
+            node = (y - 1) * width + x
+        elif direction == 1:
+            node = (y + 1) * width + x
+        elif direction == 2:
+            node = y * width + (x - 1)
+        else:
+            node = y * width + (x + 1)
+        length += 1
+
+    path = np.empty(length, dtype=np.int8)
+    node = goal
+    i = length - 1
+    while node != start:
+        direction = parent_dir[node]
+        path[i] = direction
+        i -= 1
+        x = node % width
+        y = node // width
+        if direction == 0:
+            node = (y - 1) * width + x
+        elif direction == 1:
+            node = (y + 1) * width + x
+        elif direction == 2:
+            node = y * width + (x - 1)
+        else:
+            node = y * width + (x + 1)
+
+    return path